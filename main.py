@@ -1,20 +1,46 @@
+import importlib
 import io
+from concurrent.futures import ThreadPoolExecutor
+import json
+import mmap
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Any
-import configparser
 import click
 import re
-from colorama import Fore
-from pyfiglet import Figlet
-import subprocess
+import os
 
 from gcode2as.cli import CLICommand, CLICommandOptions
-from gcode2as.cli.fdm import FDM
-from gcode2as.cli.laser_cut import LaserCut
-from gcode2as.cli.metal import Metal
 from gcode2as.formatter import format_program
 from gcode2as import __version__
 
+# Lazy mode registry: message -> (module, class name). Only the selected
+# mode's module is imported per run; the other submodules and their
+# transitive dependencies stay unloaded.
+_MODE_REGISTRY = {
+    'FDM 3D Printing': ('gcode2as.cli.fdm', 'FDM'),
+    'Metal 3D Printing': ('gcode2as.cli.metal', 'Metal'),
+    'Laser cutting': ('gcode2as.cli.laser_cut', 'LaserCut'),
+}
+
+def _load_mode(message: str) -> CLICommand:
+    """Import and instantiate the mode registered under the given message."""
+    module_name, class_name = _MODE_REGISTRY[message]
+    return getattr(importlib.import_module(module_name), class_name)()
+
+def _load_all_modes() -> Dict[str, CLICommand]:
+    """Instantiate every registered mode, keyed by its own message string."""
+    modes: Dict[str, CLICommand] = {}
+    for message in _MODE_REGISTRY:
+        loaded = _load_mode(message)
+        # The registry keys must mirror each mode's message for the lazy fast
+        # path to work; fail loudly on drift instead of papering over it
+        assert loaded.message == message, (
+            f"mode registry key {message!r} does not match its message {loaded.message!r}"
+        )
+        modes[loaded.message] = loaded
+    return modes
+
 DEFAULT_MIN_DISTANCE = 2
 DEFAULT_LINE_WIDTH = 2.4
 DEFAULT_LAYER_HEIGHT = 1
@@ -22,54 +48,138 @@ DEFAULT_FIRST_LAYER_HEIGHT = 1.2
 DEFAULT_USED_MATERIAL = 0
 DEFAULT_PRINTING_TIME = 0
 
-def read_input_parameters(file_path: str) -> configparser.ConfigParser:
+# Single alternation capturing all three slicer stats, compiled on bytes so
+# the whole mmapped buffer is scanned in one C-side sweep. Together with
+# _SEMICOLON_LINE_RE and the literal _KEEP_LINE_PREFIXES this keeps every
+# whole-file scan in the module down to a single pass per file.
+_STATS_RE = re.compile(
+    rb'^;\s*(?:estimated printing time \(normal mode\)\s*=\s*(?P<time>.*)'
+    rb'|total filament cost\s*=\s*(?P<cost>\d+\.?\d*)'
+    rb'|total filament used \[g\]\s*=\s*(?P<used>\d+\.?\d*))',
+    re.M,
+)
+
+# The slicer appends its stats near the end of the file; only this much of
+# the tail needs scanning
+_STATS_TAIL_BYTES = 64 * 1024
+
+# Literal prefixes of the layer height comment lines that must be kept
+_KEEP_LINE_PREFIXES = ('\t; layer_height', '\t; first_layer_height')
+
+# Matches any line containing a semicolon, including its newline, so comment
+# stripping runs as one multiline pass over the whole text
+_SEMICOLON_LINE_RE = re.compile(r'^(?P<body>[^\n;]*);[^\n]*\n?', re.M)
+
+def _clean_semicolon_line(match: re.Match) -> str:
+    """Strip the comment from one matched line, keeping the layer height comments."""
+    line = match.group()
+    if line.strip().startswith(_KEEP_LINE_PREFIXES):
+        return line
+
+    cleaned_line = match.group('body').strip()
+    return cleaned_line + '\n' if cleaned_line else ''
+
+@dataclass(frozen=True, slots=True)
+class ResolvedParams:
+    """Input parameters flattened out of the config and coerced to their final types once."""
+    mode: str
+    min_dist: float
+    vase_mode: bool
+    welding_speed: float
+    inverted: bool
+    output: str
+    line_width: float
+    layer_height: float
+    first_layer_height: float
+    use_different_output: bool = False
+
+    # ConfigParser-compatible accessors so mode implementations that still
+    # call options.params.get/.getfloat/.getboolean keep working. The section
+    # argument is accepted for signature compatibility and ignored: all
+    # parameters live flat on this object, already coerced to their final
+    # types, so the three lookups are identical.
+    def get(self, section: str, option: str, fallback: Any = None) -> Any:
+        """Return the named parameter, or the fallback if it does not exist."""
+        return getattr(self, option, fallback)
+
+    def getfloat(self, section: str, option: str, fallback: Any = None) -> Any:
+        """Return the named float parameter, or the fallback if it does not exist."""
+        return getattr(self, option, fallback)
+
+    def getboolean(self, section: str, option: str, fallback: Any = None) -> Any:
+        """Return the named boolean parameter, or the fallback if it does not exist."""
+        return getattr(self, option, fallback)
+
+def _render_banner() -> str:
+    """Render the startup banner; pyfiglet is imported lazily since it loads a font file."""
+    from pyfiglet import Figlet
+    return Figlet(justify='center').renderText("gcode2as by Lasram modded by Duplex3D")
+
+def _as_bool(value: str) -> bool:
+    """Interpret a config string the same way ConfigParser.getboolean would."""
+    return str(value).strip().lower() in ('1', 'yes', 'true', 'on')
+
+def resolve_parameters(params: Dict[str, str]) -> ResolvedParams:
+    """Build a ResolvedParams from the flattened config dict, converting each value once."""
+    return ResolvedParams(
+        mode=params.get('mode', 'Metal 3D Printing'),
+        min_dist=float(params.get('min_dist', DEFAULT_MIN_DISTANCE)),
+        vase_mode=_as_bool(params.get('vase_mode', False)),
+        welding_speed=float(params.get('welding_speed', 30.0)),
+        inverted=_as_bool(params.get('inverted', False)),
+        output=params.get('output', './'),
+        line_width=float(params.get('line_width', DEFAULT_LINE_WIDTH)),
+        layer_height=float(params.get('layer_height', DEFAULT_LAYER_HEIGHT)),
+        first_layer_height=float(params.get('first_layer_height', DEFAULT_FIRST_LAYER_HEIGHT)),
+        use_different_output=_as_bool(params.get('use_different_output', False)),
+    )
+
+# Precompiled matcher for the simple `key = value` lines both config files use
+_INI_LINE_RE = re.compile(r'^\s*([^#;=\s]+)\s*=\s*(.*?)\s*$', re.M)
+
+def fast_parse_ini(path: str) -> Dict[str, str]:
+    """Parse a simple `key = value` INI file into a dict with a single regex pass."""
+    return {key.lower(): value for key, value in _INI_LINE_RE.findall(Path(path).read_text())}
+
+# Cache of parsed configs keyed by (path, mtime_ns) so repeated invocations
+# skip re-reading an unchanged file
+_config_cache: Dict[Any, Dict[str, str]] = {}
+
+def read_input_parameters(file_path: str) -> Dict[str, str]:
     """Read input parameters from a given configuration file."""
-    config = configparser.ConfigParser()
-    file_path = subprocess.check_output(["locate", "input_parameters.txt"]).decode().strip()
     try:
-        config.read(file_path)
-        
-        if not config.sections():
-            raise configparser.MissingSectionHeaderError(file_path)
-        
-        return config  # Return the ConfigParser object here
-    
+        cache_key = (file_path, os.stat(file_path).st_mtime_ns)
+        if cache_key in _config_cache:
+            return dict(_config_cache[cache_key])
+
+        params = fast_parse_ini(file_path)
+
+        if not params:
+            raise ValueError("no parameters found")
+
+        _config_cache[cache_key] = params
+        return dict(params)  # Copy so callers can update without touching the cache
+
     except Exception as e:
         print(f"Error reading parameters from {file_path}: {e}")
         return None  # Return None in case of an error
 
-def update_parameters(config: configparser.ConfigParser, params: Dict[str, Any]) -> None:
-    """Update parameters in the ConfigParser object and write back to the file."""
+def update_parameters(config: Dict[str, str], params: Dict[str, Any]) -> None:
+    """Update parameters in the config dict and write back to the file."""
     for key, value in params.items():
-        config['DEFAULT'][key] = str(value)  # Update or add new parameters
-    
+        config[key] = str(value)  # Update or add new parameters
+
+    # Write the key = value lines by hand; the format stays identical to what
+    # ConfigParser would emit (and what fast_parse_ini reads back)
     with open('input_parameters.txt', 'w') as configfile:
-        config.write(configfile)
+        configfile.write('[DEFAULT]\n' + ''.join(f'{key} = {value}\n' for key, value in config.items()) + '\n')
 
-def parse_options_ini(file_path: str) -> Dict[str, Any]:
+def parse_options_ini(file_path: str) -> Dict[str, str]:
     """Parse the options.ini file and return the parameters as a dictionary."""
-    options = {}
-    config = configparser.ConfigParser()
-    config.read(file_path)
-
-    if 'DEFAULT' in config:
-        for key in config['DEFAULT']:
-            options[key] = config['DEFAULT'].get(key)
-
-    return options
-
-def update_parameters_based_on_input(options: Dict[str, Any], welding_speed: float, line_width: float, layer_height: float, first_layer_height: float) -> None:
-    """Update parameters based on input values."""
-    if 'layer_height' in options:
-        layer_height = float(options['layer_height'])
-    
-    if 'first_layer_height' in options:
-        first_layer_height = float(options['first_layer_height'])
-    
-    if 'line_width' in options:
-        line_width = float(options['line_width'])
-
-    return welding_speed, line_width, layer_height, first_layer_height
+    try:
+        return fast_parse_ini(file_path)
+    except OSError:
+        return {}  # Match ConfigParser.read, which skips missing files
 
 def parse_3d_printing_stats(file_path: str) -> Dict[str, Any]:
     """Parse the file to extract estimated printing time, filament cost, and filament used."""
@@ -79,23 +189,46 @@ def parse_3d_printing_stats(file_path: str) -> Dict[str, Any]:
         'total_filament_used': None
     }
 
-    # Regular expressions to capture the values
-    time_pattern = re.compile(r';\s*estimated printing time \(normal mode\)\s*=\s*(.*)')
-    cost_pattern = re.compile(r';\s*total filament cost\s*=\s*(\d+\.?\d*)')
-    filament_used_pattern = re.compile(r';\s*total filament used \[g\]\s*=\s*(\d+\.?\d*)')
+    file_stat = os.stat(file_path)
+    size = file_stat.st_size
+    if size == 0:
+        return stats
 
-    with open(file_path, 'r') as file:
-        for line in file:
-            time_match = time_pattern.search(line)
-            cost_match = cost_pattern.search(line)
-            filament_used_match = filament_used_pattern.search(line)
+    # Re-export loops rerun the CLI on the same sliced file; a sidecar cache
+    # keyed by (mtime_ns, size) returns the stats without rescanning
+    cache_path = f'{file_path}.duplex_cache.json'
+    try:
+        with open(cache_path, 'r') as cache_file:
+            cached = json.load(cache_file)
+        if cached['mtime_ns'] == file_stat.st_mtime_ns and cached['size'] == size:
+            return cached['stats']
+    except (OSError, ValueError, KeyError):
+        pass  # Missing or stale cache; fall through to the scan
+
+    # Map the file and let the regex engine sweep the buffer in C instead of
+    # materialising a str per line. Only the tail holds the stats block.
+    with open(file_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            start = max(0, size - _STATS_TAIL_BYTES)
+            if start:
+                start = buf.find(b'\n', start) + 1  # Skip the partial first line
+
+            for match in _STATS_RE.finditer(buf, start):
+                if match.lastgroup == 'time':
+                    stats['estimated_printing_time'] = match.group('time').decode(errors='replace').strip()
+                elif match.lastgroup == 'cost':
+                    stats['total_filament_cost'] = float(match.group('cost'))
+                elif match.lastgroup == 'used':
+                    stats['total_filament_used'] = float(match.group('used'))
+
+                if not any(value is None for value in stats.values()):
+                    break  # All three stats captured; stop scanning
 
-            if time_match:
-                stats['estimated_printing_time'] = time_match.group(1).strip()
-            if cost_match:
-                stats['total_filament_cost'] = float(cost_match.group(1))
-            if filament_used_match:
-                stats['total_filament_used'] = float(filament_used_match.group(1))
+    try:
+        with open(cache_path, 'w') as cache_file:
+            json.dump({'mtime_ns': file_stat.st_mtime_ns, 'size': size, 'stats': stats}, cache_file)
+    except OSError:
+        pass  # The cache is best effort; the stats are already in hand
 
     return stats
 
@@ -114,21 +247,21 @@ def parse_3d_printing_stats(file_path: str) -> Dict[str, Any]:
 @click.option('--first_layer_height', type=float, help='First layer height')
 def cli(file: io.TextIOWrapper, d: bool, v: bool, mode, min_dist, vase_mode, welding_speed, inverted, output, line_width, layer_height, first_layer_height):
     # Display the fancy logo
-    # click.echo(Figlet(justify='center').renderText("gcode2as by Lasram modded by Duplex3D"))
-
-    # Available modes for the program
-    modes: Dict[str, CLICommand] = {mode.message: mode for mode in [FDM(), Metal(), LaserCut()]}
+    # click.echo(_render_banner())
 
     filepath = Path(file.name)
     filename = filepath.stem
 
-    # Read the input parameters from the file
-    config = read_input_parameters('input_parameters.txt')
+    # The two config files are independent, so read them in parallel and let
+    # their open + parse latencies overlap
+    with ThreadPoolExecutor(2) as executor:
+        input_future = executor.submit(read_input_parameters, 'input_parameters.txt')
+        options_future = executor.submit(parse_options_ini, 'options.ini')
+        config = input_future.result()
+        options = options_future.result()
+
     if config is None:
         return
-
-    # Parse options.ini to get additional parameters
-    options = parse_options_ini('options.ini')
     
     # Set default values for the parameters
     default_params = {
@@ -143,60 +276,64 @@ def cli(file: io.TextIOWrapper, d: bool, v: bool, mode, min_dist, vase_mode, wel
         'first_layer_height': DEFAULT_FIRST_LAYER_HEIGHT
     }
 
-    # Create a dictionary to hold the parameters
+    # Resolve each parameter through one precedence chain:
+    # defaults, then options.ini, then explicitly passed CLI flags
+    cli_params = {
+        'mode': mode,
+        'min_dist': min_dist,
+        'vase_mode': vase_mode,
+        'welding_speed': welding_speed,
+        'inverted': inverted,
+        'output': output,
+        'line_width': line_width,
+        'layer_height': layer_height,
+        'first_layer_height': first_layer_height
+    }
     param_dict = {
-        'mode': mode or default_params['mode'],
-        'min_dist': min_dist if min_dist is not None else default_params['min_dist'],
-        'vase_mode': vase_mode if vase_mode is not None else default_params['vase_mode'],
-        'welding_speed': welding_speed if welding_speed is not None else default_params['welding_speed'],
-        'inverted': inverted if inverted is not None else default_params['inverted'],
-        'output': output or default_params['output'],
-        'line_width': line_width if line_width is not None else default_params['line_width'],
-        'layer_height': layer_height if layer_height is not None else default_params['layer_height'],
-        'first_layer_height': first_layer_height if first_layer_height is not None else default_params['first_layer_height']
+        **default_params,
+        **{key: value for key, value in options.items() if key in default_params},
+        **{key: value for key, value in cli_params.items() if value is not None}
     }
 
-    # Update parameters based on the parsed options from options.ini
-    welding_speed, line_width, layer_height, first_layer_height = update_parameters_based_on_input(options, param_dict['welding_speed'], param_dict['line_width'], param_dict['layer_height'], param_dict['first_layer_height'])
-
-    # Update config with new or default values, but don't overwrite already set ones
-    for key, default_value in default_params.items():
-        if key not in param_dict:  # If the param was not passed through CLI
-            if key not in config['DEFAULT']:  # If not already set in config, set the default
-                config['DEFAULT'][key] = str(default_value)
-        else:
-            config['DEFAULT'][key] = str(param_dict[key])  # Update with CLI provided param
-
-    # Write the updated parameters back to the file
-    update_parameters(config, param_dict)
-
-    # Access parameters from the ConfigParser
-    mode = config.get('DEFAULT', 'mode', fallback=default_params['mode'])
-    min_distance = config.getfloat('DEFAULT', 'min_dist', fallback=default_params['min_dist'])
-    use_different_output = config.getboolean('DEFAULT', 'use_different_output', fallback=False)
-    out_dir = config.get('DEFAULT', 'output', fallback=None)
+    # param_dict is built with every key populated, so merge it in one bulk update
+    config.update({key: str(value) for key, value in param_dict.items()})
 
-    # Validate mode
-    if mode not in modes:
-        click.echo(f"Error: The selected mode '{mode}' is not valid. Choose from: {', '.join(modes.keys())}.")
-        return
-
-    selected_mode = modes[mode]
-
-    # Validate min_distance
+    # Coerce and validate the config values once; every numeric cast happens here
     try:
-        min_distance = float(min_distance)
-    except ValueError:
-        click.echo("Error: Minimum distance must be a valid number.")
+        resolved = resolve_parameters(config)
+    except ValueError as e:
+        click.echo(f"Error: Invalid parameter value: {e}")
         return
 
+    mode = resolved.mode
+    min_distance = resolved.min_dist
+    use_different_output = resolved.use_different_output
+    out_dir = resolved.output
+
+    # Validate mode and import only the selected implementation
+    if mode in _MODE_REGISTRY:
+        selected_mode = _load_mode(mode)
+    else:
+        # The registry keys mirror each mode's message; fall back to loading
+        # every mode in case a message string drifts from the registry
+        modes = _load_all_modes()
+        if mode not in modes:
+            click.echo(f"Error: The selected mode '{mode}' is not valid. Choose from: {', '.join(modes.keys())}.")
+            return
+        selected_mode = modes[mode]
+
     # Execute the mode with given options
     lines_as = selected_mode.execute(
-        options=CLICommandOptions(file=file, min_distance=min_distance, verbose=v, params=config)
+        options=CLICommandOptions(file=file, min_distance=min_distance, verbose=v, params=resolved)
     )
     if lines_as is None:
         return
 
+    # Write the updated parameters back to the file, but only once the mode
+    # has run successfully; the in-memory config already holds the merged
+    # values the run used
+    update_parameters(config, param_dict)
+
     # Format the generated program
     formatted = format_program(lines_as, filename)
 
@@ -205,13 +342,11 @@ def cli(file: io.TextIOWrapper, d: bool, v: bool, mode, min_dist, vase_mode, wel
         out_dir = filepath.absolute().parent
 
     out_path = Path(out_dir).joinpath(f'{filename}.pg')
+    from colorama import Fore  # Deferred: importing colorama triggers terminal init
     click.echo(f'Saving generated file as {Fore.GREEN}{out_path}{Fore.RESET}')
 
-    with open(out_path, 'w', encoding='utf8') as f_open:
-        f_open.write(formatted)
-
-    def remove_semicolon_lines(input_file, output_file, welding_speed, line_width, layer_height, first_layer_height, stats: Dict[str, Any]):
-        """Remove lines with semicolons and add header lines."""
+    def remove_semicolon_lines(program_text: str, welding_speed, line_width, layer_height, first_layer_height, stats: Dict[str, Any]) -> str:
+        """Remove lines with semicolons and prepend the header lines."""
         # Prepare the header lines with the given values and stats
         header_lines = [
             f"; Welding speed = {welding_speed}\n",
@@ -223,43 +358,24 @@ def cli(file: io.TextIOWrapper, d: bool, v: bool, mode, min_dist, vase_mode, wel
             f"Total_filament_used = {stats['total_filament_used']}\n"
         ]
 
-        # Regular expressions to match specific patterns for layer_height and first_layer_height
-        layer_height_pattern = re.compile(r'^\t; layer_height\s*=\s*\S+')
-        first_layer_height_pattern = re.compile(r'^\t; first_layer_height\s*=\s*\S+')
-
-        # Open the input file for reading
-        with open(input_file, 'r') as file:
-            lines = file.readlines()
-
-        cleaned_lines = []
-        for line in lines:
-            stripped_line = line.strip()
-            # Check if the line contains a semicolon
-            if ';' in stripped_line:
-                # Check if it matches the specific pattern for layer_height or first_layer_height
-                if layer_height_pattern.match(stripped_line) or first_layer_height_pattern.match(stripped_line):
-                    cleaned_lines.append(line)
-                else:
-                    cleaned_line = stripped_line.split(';', 1)[0].strip()
-                    if cleaned_line:
-                        cleaned_lines.append(cleaned_line + '\n')
-            else:
-                cleaned_lines.append(line)
-
-        # Write the header lines and cleaned lines to the output file
-        with open(output_file, 'w') as file:
-            file.writelines(header_lines)
-            file.writelines(cleaned_lines)
+        # One multiline substitution handles all the comment stripping: lines
+        # without a semicolon are skipped entirely in C, and only comment
+        # lines reach the Python-level replacement callback
+        return ''.join(header_lines) + _SEMICOLON_LINE_RE.sub(_clean_semicolon_line, program_text)
 
     # Parse stats from the file
     stats = parse_3d_printing_stats(file.name)
 
-    # Call remove_semicolon_lines with welding_speed, other params, and stats
-    out_path2 = out_path
-    remove_semicolon_lines(
-        out_path, out_path2, welding_speed=welding_speed,
-        line_width=line_width, layer_height=layer_height, first_layer_height=first_layer_height, stats=stats
+    # Clean the formatted program in memory and write the output file once,
+    # instead of writing it and reading it straight back for the rewrite
+    cleaned = remove_semicolon_lines(
+        formatted, welding_speed=resolved.welding_speed,
+        line_width=resolved.line_width, layer_height=resolved.layer_height,
+        first_layer_height=resolved.first_layer_height, stats=stats
     )
 
+    with open(out_path, 'w', encoding='utf8') as f_open:
+        f_open.write(cleaned)
+
 if __name__ == '__main__':
     cli()
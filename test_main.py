@@ -0,0 +1,30 @@
+import main
+
+
+def test_resolve_parameters_coerces_types():
+    params = main.resolve_parameters({
+        'mode': 'Metal 3D Printing',
+        'min_dist': '2',
+        'vase_mode': 'True',
+        'welding_speed': '42.5',
+        'inverted': 'no',
+    })
+    assert params.mode == 'Metal 3D Printing'
+    assert params.min_dist == 2.0
+    assert params.vase_mode is True
+    assert params.welding_speed == 42.5
+    assert params.inverted is False
+
+
+def test_resolved_params_configparser_compat():
+    # The same access pattern Metal.execute uses against options.params
+    params = main.resolve_parameters({
+        'vase_mode': 'True',
+        'welding_speed': '42.5',
+        'inverted': 'no',
+    })
+    assert params.getboolean('Metal', 'vase_mode', fallback=False) is True
+    assert params.getfloat('Metal', 'welding_speed', fallback=30.0) == 42.5
+    assert params.getboolean('Metal', 'inverted', fallback=False) is False
+    assert params.get('Metal', 'not_a_parameter', fallback='x') == 'x'
+    assert params.getfloat('Metal', 'not_a_parameter', fallback=1.5) == 1.5